@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2015 Pavel Vomacka
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+    Check that readers of the database never see half-written commands and
+    are not blocked while the database is written in place or published.
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import manpageParser
+
+# Number of switches stored for each command in round 0. Every next round
+# stores one switch more, so switches of different rounds can be told apart.
+switch_count = 20
+
+
+def check_commands(rows):
+    """
+        Check command and switch description rows seen by reader. All
+        switches of a command have to come from one round and there has to be
+        all of them. Returns list of errors.
+    """
+    commands = {}
+    for command, description in rows:
+        commands.setdefault(command, []).append(description)
+
+    errors = []
+    for command, descriptions in commands.items():
+        rounds = set(descriptions)
+
+        if None in rounds:
+            errors.append("Command " + command + " without switches")
+        elif len(rounds) != 1:
+            errors.append("Command " + command + " with switches from rounds " +
+                          ", ".join(sorted(rounds)))
+        else:
+            expected = switch_count + int(descriptions[0].split()[1])
+            if len(descriptions) != expected:
+                errors.append("Command " + command + " with " +
+                              str(len(descriptions)) + " of " + str(expected) +
+                              " switches")
+
+    return errors
+
+
+def reader(database_file, stop, result):
+    """
+        Look up commands with their switches until stop is set.
+    """
+    lookups = 0
+    errors = []
+
+    while not stop.is_set():
+        try:
+            db = sqlite3.connect(database_file, timeout=0.1)
+            curs = db.execute("SELECT command.command, switch.description "
+                              "FROM command LEFT JOIN switch "
+                              "ON switch.command_id=command.id")
+            errors.extend(check_commands(curs.fetchall()))
+            db.close()
+            lookups += 1
+        except sqlite3.Error as e:
+            errors.append(repr(e))
+
+    result.put((lookups, errors[:10]))
+
+
+def build(publish, commands, round_num):
+    """
+        Store commands into the database in place or by publishing. Commands
+        'cmd<N>' are rewritten by each round, every round also adds its own
+        new commands.
+    """
+    database_file = os.path.join(manpageParser.db_path, manpageParser.db_file)
+
+    if publish:
+        manpageParser.prepare_publish_db(False)
+    elif os.path.exists(database_file):
+        manpageParser.open_db()
+    else:
+        manpageParser.create_empty_db()
+
+    os_id = manpageParser.handle_system("check")
+    manpageParser.start_run(os_id, False)
+
+    flags = [("-" + str(j), "ARG", "round " + str(round_num))
+             for j in range(switch_count + round_num)]
+    for i in range(commands):
+        manpageParser.put_manpage_into_db(os_id, None, "cmd" + str(i), 1, flags)
+        manpageParser.put_manpage_into_db(os_id, None, "round" + str(round_num) +
+                                          "_cmd" + str(i), 1, flags)
+
+    if publish:
+        manpageParser.publish_db()
+    else:
+        manpageParser.finish_run()
+        manpageParser.opened_db.close()
+
+
+def parse_options():
+    """
+        Parse options
+    """
+    parser = argparse.ArgumentParser(description="Run reader processes "
+                                     "against the database while it is written "
+                                     "in place and published.")
+    parser.add_argument("--readers", type=int, default=4,
+                        help="Number of reader processes. Default: 4")
+    parser.add_argument("--commands", type=int, default=300,
+                        help="Number of commands stored by each run. Default: 300")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Number of in-place and publish run pairs. Default: 3")
+    parser.add_argument("--schema-file", default=os.path.join(
+                        os.path.dirname(os.path.abspath(__file__)), "..", "schema.sql"),
+                        help="File with database schema.")
+
+    return parser.parse_args()
+
+
+def main():
+    """
+        Main function.
+    """
+    args = parse_options()
+
+    manpageParser.db_path = tempfile.mkdtemp()
+    manpageParser.schema_file = args.schema_file
+    database_file = os.path.join(manpageParser.db_path, manpageParser.db_file)
+
+    try:
+        build(False, args.commands, 0)
+
+        stop = multiprocessing.Event()
+        result = multiprocessing.Queue()
+        readers = [multiprocessing.Process(target=reader,
+                                           args=(database_file, stop, result))
+                   for i in range(args.readers)]
+
+        for process in readers:
+            process.start()
+
+        try:
+            for i in range(args.rounds):
+                build(False, args.commands, 2 * i + 1)
+                build(True, args.commands, 2 * i + 2)
+        finally:
+            stop.set()
+            # Results have to be read before joining, queue could block.
+            results = [result.get() for process in readers]
+            for process in readers:
+                process.join()
+
+        failed = False
+        for lookups, errors in results:
+            print("Reader: " + str(lookups) + " lookups, " +
+                  str(len(errors)) + " errors")
+            for error in errors:
+                failed = True
+                print("\t" + error)
+
+        db = sqlite3.connect(database_file)
+        integrity = db.execute("PRAGMA integrity_check").fetchone()[0]
+        final_errors = check_commands(db.execute(
+            "SELECT command.command, switch.description FROM command "
+            "LEFT JOIN switch ON switch.command_id=command.id").fetchall())
+        db.close()
+        print("Integrity check: " + integrity)
+
+        for error in final_errors[:10]:
+            failed = True
+            print("\t" + error)
+
+        if failed or integrity != "ok":
+            sys.exit(1)
+    finally:
+        shutil.rmtree(manpageParser.db_path)
+
+
+"""
+    Run main function.
+"""
+if __name__ == "__main__":
+    main()
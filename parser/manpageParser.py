@@ -25,10 +25,14 @@
 from __future__ import print_function
 
 import argparse
+import datetime
+import fcntl
 import os
 import sys
 import re
 import subprocess, shlex
+import shutil
+import time
 from threading import Timer
 import sqlite3
 
@@ -43,6 +47,16 @@ db_path = "/tmp/switchTest/"
 # Database schema
 schema_file = "./schema.sql"
 opened_db = None
+# Tables which have to be present in database.
+db_tables = ('system', 'command', 'switch',)
+# Temporary database file used when publishing.
+tmp_db_file = None
+# ID of current run in journal.
+current_run = None
+# Lock file of output database.
+lock_file = None
+# Start time and number of finished items of each stage, used for ETA.
+progress_start = {}
 
 def err_print(*args, **kwargs):
     """
@@ -51,32 +65,88 @@ def err_print(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 
-def create_empty_db():
+def to_unicode(text):
+    """
+        Decode output of command. Python 2 returns it as bytes, which sqlite3
+        refuses to store when they are not ASCII.
+    """
+    if not isinstance(text, type(u"")):
+        text = text.decode('utf-8', 'replace')
+
+    return text
+
+
+def lock_db():
+    """
+        Lock output database, so two runs of the script can not write it
+        at once. The lock is held until the script ends.
+    """
+    global lock_file
+
+    if not os.path.exists(db_path):
+        os.makedirs(db_path)
+
+    lock_file = open(os.path.join(db_path, db_file + ".lock"), 'w')
+
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        raise RuntimeError("Database " + os.path.join(db_path, db_file) +
+                           " is used by another run of the script.")
+
+
+def tune_db():
+    """
+        Set pragmas of opened DB. WAL journal allows readers to query
+        the database while switches are written.
+    """
+    curs = opened_db.cursor()
+
+    curs.execute("PRAGMA journal_mode=WAL")
+    curs.execute("PRAGMA synchronous=NORMAL")
+    curs.execute("PRAGMA temp_store=MEMORY")
+    curs.execute("PRAGMA cache_size=-65536")
+
+
+def create_empty_db(database_file=None):
     """
         Prepare empty database.
     """
     global opened_db
 
-    database_file = os.path.join(db_path, db_file)
+    if database_file is None:
+        database_file = os.path.join(db_path, db_file)
     print("\tCreating new database file " + database_file)
 
     if not os.path.exists(db_path):
         os.makedirs(db_path)
 
-    with sqlite3.connect(os.path.join(db_path, db_file)) as opened_db:
+    with sqlite3.connect(database_file) as opened_db:
+        tune_db()
+
         print("\t\tImporting database schema...")
-        with open(schema_file, 'rt') as schema_f:
-            schema = schema_f.read()
+        apply_schema()
 
-        # Aplly the schema.
-        opened_db.executescript(schema)
 
-def open_db():
+def apply_schema():
+    """
+        Apply database schema to opened DB. Schema creates only tables
+        which do not exist yet.
+    """
+    with open(schema_file, 'rt') as schema_f:
+        schema = schema_f.read()
+
+    # Aplly the schema.
+    opened_db.executescript(schema)
+
+def open_db(database_file=None):
     """
         Open DB file.
     """
     global opened_db
-    database_file = os.path.join(db_path, db_file)
+
+    if database_file is None:
+        database_file = os.path.join(db_path, db_file)
     print("\tOpening DB file: " + database_file)
 
     opened_db = sqlite3.connect(database_file)
@@ -85,13 +155,273 @@ def open_db():
 
     # Check whether correct tables exists in db
     curs.execute("SELECT count(*) FROM sqlite_master WHERE type='table' AND ("
-    "name=? OR name=? OR name=?);", ('system', 'command', 'switch',))
+    "name=? OR name=? OR name=?);", db_tables)
 
     table_count = curs.fetchone()[0]
 
-    if table_count != 3:
+    if table_count != len(db_tables):
         raise RuntimeError
 
+    tune_db()
+    upgrade_db()
+
+
+def upgrade_db():
+    """
+        Add columns and tables which are missing in database created by
+        older version of this script.
+    """
+    curs = opened_db.cursor()
+
+    switch_columns = get_table_columns('switch')
+    for column in ('argument', 'description',):
+        if column not in switch_columns:
+            curs.execute("ALTER TABLE switch ADD COLUMN " + column + " text")
+
+    curs.execute("SELECT count(*) FROM sqlite_master WHERE name=?",
+                 ('switch_fts',))
+    fts_exists = curs.fetchone()[0] != 0
+
+    # Create missing tables.
+    apply_schema()
+
+    if not fts_exists:
+        print("\t\tCreating full-text index of switches...")
+        # Index switches which were stored before the index existed.
+        with opened_db:
+            curs.execute("INSERT INTO switch_fts(switch_fts) VALUES('rebuild')")
+
+
+def get_table_columns(table, schema="main"):
+    """
+        Get names of all columns of the table.
+    """
+    curs = opened_db.cursor()
+
+    curs.execute("PRAGMA " + schema + ".table_info(" + table + ")")
+
+    return [column[1] for column in curs.fetchall()]
+
+
+def copy_db(source_file, replace=False):
+    """
+        Copy all records from source_file database into opened DB in one
+        transaction. Only columns present in both databases are copied.
+        With replace all current records of opened DB are removed first.
+    """
+    opened_db.execute("ATTACH DATABASE ? AS source", (source_file,))
+
+    # Python 2 sqlite3 commits open transaction before PRAGMA, so columns
+    # have to be known before the transaction starts.
+    table_columns = {}
+    for table in db_tables:
+        source_columns = get_table_columns(table, "source")
+        columns = [c for c in get_table_columns(table) if c in source_columns]
+        table_columns[table] = ", ".join(columns)
+
+    with opened_db:
+        for table in db_tables:
+            columns = table_columns[table]
+
+            if replace:
+                opened_db.execute("DELETE FROM main." + table)
+            opened_db.execute("INSERT INTO main." + table + "(" + columns + ") "
+                              "SELECT " + columns + " FROM source." + table)
+
+    opened_db.execute("DETACH DATABASE source")
+
+
+def prepare_publish_db(resume):
+    """
+        Create temporary database next to the output database and fill it
+        with records of the output database. The output database is updated
+        by publish_db() when all pages are parsed. When resuming, temporary
+        database left by the interrupted run is used.
+    """
+    global tmp_db_file
+    database_file = os.path.join(db_path, db_file)
+
+    # Temporary file has to be on the same filesystem to make rename atomic.
+    tmp_db_file = database_file + ".tmp"
+
+    if resume and os.path.exists(tmp_db_file):
+        open_db(tmp_db_file)
+        return
+
+    remove_db_files(tmp_db_file)
+    create_empty_db(tmp_db_file)
+
+    if os.path.exists(database_file):
+        print("\tCopying records from " + database_file)
+        shutil.copymode(database_file, tmp_db_file)
+        copy_db(database_file)
+
+
+def remove_db_files(database_file):
+    """
+        Remove database file together with its -wal and -shm files.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database_file + suffix):
+            os.remove(database_file + suffix)
+
+
+def publish_db():
+    """
+        Publish the temporary database. New output database is created by
+        atomic rename. Existing one gets all records of the temporary
+        database in one transaction, so its readers switch from old records
+        to new ones at once. Journal of the run is removed together with the
+        temporary database then.
+    """
+    global tmp_db_file
+    database_file = os.path.join(db_path, db_file)
+    print("\tPublishing database file " + database_file)
+
+    curs = opened_db.cursor()
+    # Move everything from WAL into the database file.
+    curs.execute("PRAGMA synchronous=FULL")
+    curs.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    # Unfinished statement would keep the database open after close().
+    curs.close()
+    opened_db.close()
+
+    if os.path.exists(database_file):
+        # Renaming over database in WAL mode is not safe. Its -wal and -shm
+        # files are found by file name, so the new database would pick up
+        # the ones which its readers still use for the replaced database.
+        open_db()
+        copy_db(tmp_db_file, replace=True)
+        opened_db.close()
+
+        remove_db_files(tmp_db_file)
+        tmp_db_file = None
+        return
+
+    os.rename(tmp_db_file, database_file)
+    tmp_db_file = None
+
+    # Make the rename durable.
+    dir_fd = os.open(db_path, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+    # Run is finished only when it is published, otherwise it can be resumed.
+    open_db()
+    finish_run()
+    opened_db.close()
+
+
+def keep_publish_db():
+    """
+        Close temporary database after failed run. It is kept, so the run
+        can be continued with --resume.
+    """
+    if tmp_db_file is None:
+        return
+
+    opened_db.close()
+    err_print("Temporary database " + tmp_db_file + " is kept, run again "
+              "with --resume to continue.")
+
+
+def start_run(os_id, resume):
+    """
+        Start new run of the script in journal. When resuming, the last
+        unfinished run for the system is continued if there is any.
+    """
+    global current_run
+    curs = opened_db.cursor()
+
+    if resume:
+        curs.execute("SELECT id FROM run WHERE system_id=? AND finished IS NULL "
+                     "ORDER BY id DESC LIMIT 1", (os_id,))
+        run = curs.fetchone()
+
+        if run is not None:
+            print("\tResuming interrupted run " + str(run[0]))
+            current_run = run[0]
+            return
+
+    with opened_db:
+        # Journal of unfinished runs can not be resumed anymore.
+        curs.execute("DELETE FROM journal WHERE run_id IN (SELECT id FROM run "
+                     "WHERE system_id=? AND finished IS NULL)", (os_id,))
+        curs.execute("DELETE FROM run WHERE system_id=? AND finished IS NULL",
+                     (os_id,))
+        curs.execute("INSERT INTO run(system_id, started) "
+                     "VALUES(?, datetime('now'))", (os_id,))
+
+    current_run = curs.lastrowid
+
+
+def finish_run():
+    """
+        Mark current run as finished and remove its journal.
+    """
+    with opened_db:
+        opened_db.execute("UPDATE run SET finished=datetime('now') WHERE id=?",
+                          (current_run,))
+        opened_db.execute("DELETE FROM journal WHERE run_id=?", (current_run,))
+
+
+def get_journal(kind):
+    """
+        Get items of given kind which current run has processed.
+        Returns dictionary item -> (command, finished).
+    """
+    curs = opened_db.cursor()
+
+    curs.execute("SELECT item, command, finished FROM journal "
+                 "WHERE run_id=? AND kind=?", (current_run, kind,))
+
+    return dict((row[0], (row[1], row[2])) for row in curs.fetchall())
+
+
+def journal_item(kind, item, command=None, finished=True):
+    """
+        Record item processed by current run.
+    """
+    with opened_db:
+        opened_db.execute("INSERT OR REPLACE INTO journal(run_id, kind, item, "
+                          "command, finished) VALUES(?,?,?,?,?)",
+                          (current_run, kind, item, command, int(finished),))
+
+
+def show_progress(kind, total):
+    """
+        Print number of processed items of given kind and estimated time
+        to process the rest. Items are counted in the journal.
+    """
+    curs = opened_db.cursor()
+
+    curs.execute("SELECT count(*) FROM journal WHERE run_id=? AND kind=?",
+                 (current_run, kind,))
+    done = min(curs.fetchone()[0], total)
+
+    # Items finished by interrupted run do not count into the speed.
+    if kind not in progress_start:
+        progress_start[kind] = (time.time(), done)
+    start_time, start_done = progress_start[kind]
+
+    eta = "unknown"
+    if done > start_done:
+        seconds = (time.time() - start_time) / (done - start_done) * (total - done)
+        eta = str(datetime.timedelta(seconds=int(seconds)))
+
+    message = "\t%d/%d (%d%%), ETA %s" % (done, total,
+                                          100 * done // max(total, 1), eta)
+
+    if sys.stdout.isatty():
+        sys.stdout.write("\r" + message + "   ")
+        if done == total:
+            sys.stdout.write("\n")
+        sys.stdout.flush()
+    elif done % 100 == 0 or done == total:
+        print(message)
+
 
 def add_system(sys_name):
     """
@@ -145,8 +475,6 @@ def add_command(manpage_name, command, group, sys_id):
     curs.execute("INSERT INTO command(command, manpage_name, man_group, system_id) "
                 "VALUES(?,?,?,?)", (command, manpage_name, group, str(sys_id),))
 
-    opened_db.commit()
-
     return curs.lastrowid
 
 
@@ -193,8 +521,9 @@ def store_cmds_to_db(cmds, os_id):
         Store all commands from compgen -c command to database also in case that
         we don't run --help for each command. It helps with testing of commands.
     """
-    for cmd in cmds:
-        handle_command(None, cmd, None, os_id)
+    with opened_db:
+        for cmd in cmds:
+            handle_command(None, cmd, None, os_id)
 
 
 def get_all_commands():
@@ -208,16 +537,14 @@ def get_all_commands():
     return curs.fetchall()
 
 
-def add_switch(switch, com_id):
+def add_switch(switch, argument, description, com_id):
     """
         Add switch record.
     """
     curs = opened_db.cursor()
 
-    curs.execute("INSERT INTO switch(switch, command_id) "
-                "VALUES(?,?)", (switch, str(com_id),))
-
-    opened_db.commit()
+    curs.execute("INSERT INTO switch(switch, argument, description, command_id) "
+                "VALUES(?,?,?,?)", (switch, argument, description, str(com_id),))
 
 
 def delete_associated_switches(command_id):
@@ -228,8 +555,6 @@ def delete_associated_switches(command_id):
 
     curs.execute("DELETE FROM switch WHERE command_id=?", (command_id,))
 
-    opened_db.commit()
-
 
 def prepare_dir_regex():
     """
@@ -328,7 +653,8 @@ def parse_manpage_number(path):
 
 def parse_one_page(content):
     """
-        Parse flags from manpage which is in content parameter.
+        Parse flags from manpage which is in content parameter. Each flag
+        is returned together with its argument placeholder and description.
     """
     # Create regular expression for getting flags from file \s{1,}
     flag_regex = re.compile(r"(?:\n?(?:(?:[^\w\-])|(?:\[))((?:(?:\-{1,2})|(?:\+))[#\?\w\-\+]*)"
@@ -356,8 +682,189 @@ def parse_one_page(content):
     # Remove duplicates
     parsed_flags = list(set(parsed_flags))
 
-    # Return flag which was found.
-    return parsed_flags
+    details = parse_flag_details(content)
+
+    # Return flag which was found with its argument and description.
+    return [(flag,) + details.get(flag, (None, None)) for flag in parsed_flags]
+
+
+def parse_option_head(head):
+    """
+        Parse list of flags with their arguments from the beginning of option
+        description, e.g. '-f, --file=FILE' or '-a aname'. Returns None when
+        the head looks like a sentence.
+    """
+    # Flag with optional argument joined by '=' or '[='.
+    flag_regex = re.compile(r"^((?:\-{1,2}|\+)[#\?\w][#\?\w\-\+]*)(\[?=.*)?$")
+
+    flags = []
+    after_argument = False
+
+    for token in re.split(r",\s*|\s+", head):
+        flag = flag_regex.match(token)
+        if flag is not None:
+            argument = flag.group(2)
+            if argument is not None:
+                argument = argument.replace("=", "", 1)
+            flags.append([flag.group(1), argument])
+            after_argument = argument is not None
+        elif not token or not flags:
+            continue
+        elif after_argument:
+            # Second word after flag, this is not list of flags.
+            return None
+        else:
+            flags[-1][1] = token
+            after_argument = True
+
+    # Flags without argument share it with the other flags, e.g. '-f, --file=FILE'.
+    arguments = [flag[1] for flag in flags if flag[1] is not None]
+    for flag in flags:
+        if flag[1] is None and arguments:
+            flag[1] = arguments[0]
+
+    return flags
+
+
+def split_option_line(line, indent, column):
+    """
+        Split option line whose description follows after one space only,
+        e.g. '--exclude-tag-all=FILE exclude directories containing FILE'.
+        The line is split at the description column of neighbouring options
+        when it is aligned to it. Otherwise flags and argument placeholder
+        are taken from the beginning of the line. Returns list of flags
+        and the description.
+    """
+    if (column is not None and indent < column < len(line) and
+            line[column - 1] == " " and line[column] != " "):
+        head_flags = parse_option_head(line[indent:column].strip())
+        if head_flags:
+            return head_flags, line[column:].strip()
+
+    # Argument which is not joined by '=' has to look like placeholder,
+    # e.g. 'DIR' or '<file>', otherwise it is the first word of description.
+    placeholder_regex = re.compile(r"^(?:[\[<\{].*|[A-Z][A-Z0-9_\-\.]*(?:\.\.\.)?)$")
+    flag_regex = re.compile(r"^(?:\-{1,2}|\+)[#\?\w]")
+    tokens = line.split()
+    head = []
+
+    while tokens and flag_regex.match(tokens[0]):
+        head.append(tokens.pop(0))
+        if tokens and placeholder_regex.match(tokens[0]):
+            head.append(tokens.pop(0))
+
+    return parse_option_head(" ".join(head)), " ".join(tokens)
+
+
+def find_description_columns(lines):
+    """
+        Find description columns of options which are separated from their
+        description by at least two spaces or whose description follows on
+        the next line. Returns list of (line number, column) tuples.
+    """
+    option_regex = re.compile(r"^(\s*)((?:\-{1,2}|\+)[#\?\w].*)$")
+    columns = []
+
+    for number, line in enumerate(lines):
+        option = option_regex.match(line)
+        if option is None:
+            continue
+
+        indent = len(option.group(1))
+        text = option.group(2).rstrip()
+        split = re.search(r"\s{2,}|\t", text)
+
+        if split is not None:
+            if parse_option_head(text[:split.start()]):
+                columns.append((number, indent + split.end()))
+        elif parse_option_head(text) and number + 1 < len(lines):
+            next_line = lines[number + 1]
+            next_indent = len(next_line) - len(next_line.lstrip())
+            if next_line.strip() and next_indent > indent:
+                columns.append((number, next_indent))
+
+    return columns
+
+
+def parse_flag_details(content):
+    """
+        Find argument placeholder and description paragraph of flags. Flag has
+        to be at the beginning of the line. Its description follows after at
+        least two spaces and continues on the next lines which are indented more.
+    """
+    # Line which starts by flag.
+    option_regex = re.compile(r"^(\s*)((?:\-{1,2}|\+)[#\?\w].*)$")
+    details = {}
+    flags = []
+    description = []
+    indent = 0
+    # Column where description of current flags starts.
+    description_column = None
+    # Empty line at the end stores description of the last flags.
+    lines = content.splitlines() + [""]
+    columns = find_description_columns(lines)
+
+    for number, line in enumerate(lines):
+        line_indent = len(line) - len(line.lstrip())
+
+        option = option_regex.match(line)
+        head_flags = None
+        line_description = None
+        line_column = None
+        if option is not None:
+            text = option.group(2).rstrip()
+            split = re.search(r"\s{2,}|\t", text)
+            head = text if split is None else text[:split.start()]
+            head_flags = parse_option_head(head)
+
+            if head_flags is not None:
+                if split is not None:
+                    line_description = text[split.end():]
+                    line_column = line_indent + split.end()
+            else:
+                # Description follows after one space only. Use column of
+                # the nearest option, the previous one is preferred.
+                previous = [c for n, c in columns if n < number]
+                following = [c for n, c in columns if n > number]
+                if previous:
+                    line_column = previous[-1]
+                elif following:
+                    line_column = following[0]
+                head_flags, line_description = split_option_line(
+                    line, line_indent, line_column)
+
+        # Justified description line can start by flag too, e.g. '-o  with  the'.
+        # Only line which starts left of the description is the next option.
+        if (head_flags is not None and flags and line_indent > indent and
+                (description_column is None or line_indent >= description_column)):
+            head_flags = None
+
+        if head_flags is None and line.strip() and flags and line_indent > indent:
+            # Description continues.
+            if description_column is None:
+                description_column = line_indent
+            description.append(line.strip())
+            continue
+
+        # Previous flags are complete, store them.
+        description = " ".join(" ".join(description).split()) or None
+        for flag, argument in flags:
+            known = details.get(flag)
+            if known is None or (known[1] is None and description):
+                details[flag] = (argument, description)
+
+        flags = []
+        description = []
+        description_column = None
+
+        if head_flags:
+            flags = head_flags
+            indent = line_indent
+            if line_description:
+                description = [line_description]
+            description_column = line_column
+
+    return details
 
 
 def parse_bash_page(content, command_list, os_id):
@@ -384,7 +891,7 @@ def parse_bash_page(content, command_list, os_id):
                 # add bash and so far concatenated manpage to table
                 mans['bash'] = bash_man
             else:
-                bash_man = bash_man + line
+                bash_man = bash_man + line + "\n"
         else:
             if builtin_reg.match(line):
                 # builtin command
@@ -392,14 +899,14 @@ def parse_bash_page(content, command_list, os_id):
                 if first_word in command_list:
                     # first word is correct command
                     current_builtin = first_word
-                    mans[current_builtin] = first_word
+                    mans[current_builtin] = first_word + "\n"
                     continue
             elif section_end.match(line):
                 # next section end whole for cycle
                 break
 
             if current_builtin != "":
-                mans[current_builtin] = mans[current_builtin] + line
+                mans[current_builtin] = mans[current_builtin] + line + "\n"
 
     # parse mans
     for command in mans:
@@ -419,12 +926,14 @@ def store_helps(os_id, helps):
 
 def put_manpage_into_db(os_id, man_name, command, number, flags_list):
     """
-        Insert manpage into database.
+        Insert manpage into database. Command and its switches are
+        committed in one transaction, so readers never see half-updated command.
     """
-    command_id = handle_command(man_name, command, number, os_id)
+    with opened_db:
+        command_id = handle_command(man_name, command, number, os_id)
 
-    for flag in flags_list:
-        add_switch(flag, command_id)
+        for flag, argument, description in flags_list:
+            add_switch(flag, argument, description, command_id)
 
 
 def parse_man_pages(files, builtins, os_id):
@@ -436,12 +945,21 @@ def parse_man_pages(files, builtins, os_id):
     zipped_files = "zcat "
     not_zipped_files = "cat "
     commands_stored = []
+    journal = get_journal('page')
+    show_progress('page', len(files))
 
     # Open /dev/null/ for output of groff
     f_devnull = open(os.devnull, 'w')
 
     # Check all files.
     for file_path in files:
+        # Skip pages which interrupted run has already stored.
+        if file_path in journal:
+            if journal[file_path][0] is not None:
+                commands_stored.append(journal[file_path][0])
+            continue
+
+        page = file_path
         # clean vars
         flags_list = None
         man_name = None
@@ -509,6 +1027,7 @@ def parse_man_pages(files, builtins, os_id):
                                         stdout=subprocess.PIPE,
                                         stderr=f_devnull,
                                         universal_newlines=True).communicate()[0]
+        output = to_unicode(output)
 
         number = parse_manpage_number(file_path)
 
@@ -521,6 +1040,8 @@ def parse_man_pages(files, builtins, os_id):
 
         if man_name == 'BASH':
             parse_bash_page(output, builtins, os_id)
+            journal_item('page', page)
+            show_progress('page', len(files))
             continue # manpage is put into db directly in previous function
 
         # Get list of flags for this page
@@ -531,6 +1052,8 @@ def parse_man_pages(files, builtins, os_id):
 
         put_manpage_into_db(os_id, man_name, command, number, flags_list)
         commands_stored.append(command)
+        journal_item('page', page, command)
+        show_progress('page', len(files))
 
     f_devnull.close()
     return commands_stored
@@ -589,7 +1112,19 @@ def handle_helps(os_id, cmds):
     help_cont = ''
     timeout = 2
     helps = {}
+    journal = get_journal('help')
+    show_progress('help', len(cmds))
+
     for cmd in cmds:
+        if cmd in journal:
+            # Command which was running when the run was interrupted could
+            # hang again, skip it.
+            if not journal[cmd][1]:
+                err_print("Skipping '" + cmd + " --help' which did not finish "
+                          "in interrupted run.")
+            continue
+
+        journal_item('help', cmd, finished=False)
         try:
             p = subprocess.Popen([cmd, "--help"],
                                       stdout=subprocess.PIPE,
@@ -601,17 +1136,21 @@ def handle_helps(os_id, cmds):
             timer = Timer(timeout, kill_proc, [p])
             try:
                 timer.start()
-                help_cont = p.communicate()[0]
+                help_cont = to_unicode(p.communicate()[0])
             finally:
                 timer.cancel()
 
         except OSError:
             err_print("ERROR in running '" + cmd + " --help'.")
+            journal_item('help', cmd)
+            show_progress('help', len(cmds))
             continue
 
         f_list = parse_one_page(help_cont)
 
         put_manpage_into_db(os_id, None, cmd, None, f_list)
+        journal_item('help', cmd, cmd)
+        show_progress('help', len(cmds))
 
         helps[cmd] = help_cont
 
@@ -645,6 +1184,14 @@ def parse_options():
     parser.add_argument("--output-db-dir", default="/tmp/switchTest",
                         help="Directory to write generated database to. "
                         "Default directory: /tmp/switchTest/")
+    parser.add_argument("--publish", help="Build the database into a temporary "
+                        "file and publish it at once when finished. Without "
+                        "this option the output database is updated in place.",
+                        action="store_true")
+    parser.add_argument("--resume", help="Continue the last interrupted run "
+                        "for the same OS. Manual pages and commands with "
+                        "'--help' which were already processed are skipped.",
+                        action="store_true")
     prog_args = parser.parse_args()
 
     # Name of schema file.
@@ -678,14 +1225,37 @@ def main():
         raise Exception("Must be using Python 2")
 
     print("Preparing database file...")
+    lock_db()
+
+    if args.publish:
+        # Build into temporary database which replaces the output one at the end
+        prepare_publish_db(args.resume)
     # Create empty database in case that db file does not exists
-    if os.path.exists(os.path.join(db_path, db_file)):
+    elif os.path.exists(os.path.join(db_path, db_file)):
         open_db()
     else:
         create_empty_db()
 
+    try:
+        fill_db(args)
+
+        if args.publish:
+            print("Publishing database...")
+            publish_db()
+        else:
+            finish_run()
+    except BaseException:
+        keep_publish_db()
+        raise
+
+
+def fill_db(args):
+    """
+        Parse all manpages and helps and store them into opened database.
+    """
     print("Searching OS ID...")
     current_os_id = handle_system(args.os_name + args.os_version)
+    start_run(current_os_id, args.resume)
 
     print("Fetching directories with manual pages...")
     # Get directories with manual pages
@@ -707,8 +1277,11 @@ def main():
     # Then remove all commands which are already in DB from list of all commands.
     remove_already_found_cmds(cmds, handled_cmds)
 
-    print("Storing commands from 'compgen -c' command...")
-    store_cmds_to_db(cmds, current_os_id)
+    # Storing the commands again would remove switches stored by --help.
+    if 'compgen' not in get_journal('stage'):
+        print("Storing commands from 'compgen -c' command...")
+        store_cmds_to_db(cmds, current_os_id)
+        journal_item('stage', 'compgen')
 
     # Call each command which is not in DB yet with '--help' param to gather
     # further data.
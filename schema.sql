@@ -1,11 +1,11 @@
 -- Schema for database of switches
 
-create table system (
+create table if not exists system (
 	id 	integer primary key autoincrement not null,
 	name text
 );
 
-create table command (
+create table if not exists command (
 	id 	integer primary key autoincrement not null,
 	command	text not null,
 	manpage_name text,
@@ -13,8 +13,54 @@ create table command (
 	system_id integer references system(id) not null
 );
 
-create table switch (
+create table if not exists switch (
 	id integer primary key autoincrement not null,
 	switch	text not null,
+	argument text,
+	description text,
 	command_id integer references command(id) not null
 );
+
+-- Full-text index of switches, kept in sync with switch table by triggers.
+create virtual table if not exists switch_fts using fts5(
+	switch,
+	argument,
+	description,
+	content='switch',
+	content_rowid='id'
+);
+
+create trigger if not exists switch_fts_insert after insert on switch begin
+	insert into switch_fts(rowid, switch, argument, description)
+		values (new.id, new.switch, new.argument, new.description);
+end;
+
+create trigger if not exists switch_fts_delete after delete on switch begin
+	insert into switch_fts(switch_fts, rowid, switch, argument, description)
+		values ('delete', old.id, old.switch, old.argument, old.description);
+end;
+
+create trigger if not exists switch_fts_update after update on switch begin
+	insert into switch_fts(switch_fts, rowid, switch, argument, description)
+		values ('delete', old.id, old.switch, old.argument, old.description);
+	insert into switch_fts(rowid, switch, argument, description)
+		values (new.id, new.switch, new.argument, new.description);
+end;
+
+-- Runs of the script, unfinished run can be resumed.
+create table if not exists run (
+	id integer primary key autoincrement not null,
+	system_id integer references system(id) not null,
+	started text,
+	finished text
+);
+
+-- Manual pages, --help calls and stages processed by the run.
+create table if not exists journal (
+	run_id integer references run(id) not null,
+	kind text not null,
+	item text not null,
+	command text,
+	finished integer not null default 0,
+	primary key (run_id, kind, item)
+);